@@ -1,203 +1,809 @@
 import os
+import re
+import sys
 import json
 import time
-import requests
+import queue
+import atexit
+import random
+import asyncio
+import hashlib
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from functools import lru_cache
+from datetime import date
+from urllib.parse import urlparse
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from serpapi.google_search import GoogleSearch
 
-# ANSI color codes
-class Colors:
-    CYAN = '\033[96m'
-    YELLOW = '\033[93m'
-    GREEN = '\033[92m'
-    RED = '\033[91m'
-    MAGENTA = '\033[95m'
-    BLUE = '\033[94m'
-    RESET = '\033[0m'
+# ANSI color codes, resolved once at import: empty strings when stdout is
+# redirected so CI logs carry no escape bytes
+_tty = sys.stdout.isatty()
+CYAN = '\033[96m' if _tty else ''
+YELLOW = '\033[93m' if _tty else ''
+GREEN = '\033[92m' if _tty else ''
+RED = '\033[91m' if _tty else ''
+MAGENTA = '\033[95m' if _tty else ''
+BLUE = '\033[94m' if _tty else ''
+RESET = '\033[0m' if _tty else ''
+
+class _ColorFormatter(logging.Formatter):
+    """Colorize records by level; the color constants are already TTY-gated."""
+    LEVEL_COLORS = {
+        logging.WARNING: YELLOW,
+        logging.ERROR: RED,
+    }
+
+    def __init__(self):
+        super().__init__("%(message)s")
+
+    def format(self, record):
+        msg = super().format(record)
+        color = self.LEVEL_COLORS.get(record.levelno, '')
+        return f"{color}{msg}{RESET}" if color else msg
+
+def _setup_logging():
+    """Route records through a queue so stdio writes never block the event loop."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_ColorFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger = logging.getLogger("r1_crawler")
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    return logger
+
+logger = _setup_logging()
 
 # Load environment variables
 load_dotenv()
 
 # Initialize clients
-client = OpenAI(api_key=os.getenv("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com")
+client = AsyncOpenAI(api_key=os.getenv("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com")
 firecrawl_api_key = os.getenv("FIRECRAWL_API_KEY")
 serp_api_key = os.getenv("SERP_API_KEY")
 
-def search_google(query):
-    """Search Google using SerpAPI and return top results."""
-    print(f"{Colors.YELLOW}Searching Google for '{query}'...{Colors.RESET}")
+# Every Firecrawl request goes to this host, through the one pooled client
+# below - no second HTTP stack, so keep-alive survives from the extract POST
+# through all poll GETs
+_FIRECRAWL_HOST = "api.firecrawl.dev"
+
+# One pooled HTTP client shared by all Firecrawl calls, so the extract POST
+# and every poll GET reuse a keep-alive connection instead of paying a fresh
+# TCP+TLS handshake each time. Transport retries cover transient connect errors.
+_http_client = None
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=20),
+            transport=httpx.AsyncHTTPTransport(retries=3)
+        )
+    return _http_client
+
+# orjson serializes/parses 2-5x faster than stdlib json on the SERP arrays
+# and R1 responses in the hot path; fall back to stdlib when not installed.
+try:
+    import orjson
+
+    def _json_dumps(obj, sort_keys=False, indent=False):
+        option = 0
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode()
+
+    _json_loads = orjson.loads
+    _JSONDecodeError = (json.JSONDecodeError, orjson.JSONDecodeError)
+except ImportError:
+    def _json_dumps(obj, sort_keys=False, indent=False):
+        return json.dumps(obj, sort_keys=sort_keys, indent=2 if indent else None)
+
+    _json_loads = json.loads
+    _JSONDecodeError = json.JSONDecodeError
+
+# Response cache for the deterministic R1 URL-selection call. Identical
+# (company, objective, SERP) payloads short-circuit the API entirely.
+# diskcache persists hits across runs; a plain dict covers the session otherwise.
+try:
+    import diskcache
+    _r1_cache = diskcache.Cache("./.r1_cache")
+except ImportError:
+    _r1_cache = {}
+_r1_cache_stats = {"hits": 0, "misses": 0}
+
+# SERP cache: dev loops and CI query the same company repeatedly, and each
+# SerpAPI round-trip costs ~500-1500ms plus quota. Keyed per (query, day)
+# so results repeat within the day but refresh daily.
+try:
+    _serp_cache = diskcache.Cache("./.serp_cache")
+except NameError:
+    _serp_cache = {}
+
+def _r1_cache_key(payload):
+    """Content-addressed key: SHA-256 of the canonicalized request payload."""
+    return hashlib.sha256(_json_dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def _cache_set(backend, key, value, ttl):
+    """Store a value in a dict or diskcache backend."""
+    if isinstance(backend, dict):
+        backend[key] = value
+    else:
+        backend.set(key, value, expire=ttl)
+
+def _r1_cache_set(key, value, ttl=3600):
+    """Store a response in whichever backend is active."""
+    _cache_set(_r1_cache, key, value, ttl)
+
+# Firecrawl extraction cache: extractions poll for up to two minutes and are
+# billed per URL, and the same (urls, prompt, company) triple recurs across
+# runs. FanoutCache shards the store 8 ways so concurrent extractions don't
+# contend on one lock.
+try:
+    _firecrawl_cache = diskcache.FanoutCache("./.firecrawl_cache", shards=8, size_limit=1 << 30)
+except NameError:
+    _firecrawl_cache = {}
+_firecrawl_cache_stats = {"hits": 0, "misses": 0}
+
+def _firecrawl_cache_key(urls, prompt, company):
+    """Order-independent key over the extraction inputs."""
+    payload = {"urls": sorted(urls), "prompt": prompt, "company": company}
+    return hashlib.sha256(_json_dumps(payload, sort_keys=True).encode()).hexdigest()
+
+# Semantic cache: near-duplicate (company, objective) pairs (e.g. "Tesla
+# revenue" vs "Tesla's revenue") reuse an earlier R1 URL selection instead of
+# calling the API. Needs sentence-transformers + faiss; disabled when missing.
+try:
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    _semantic_enabled = True
+except ImportError:
+    _semantic_enabled = False
+
+_SEMANTIC_THRESHOLD = 0.92
+_SEMANTIC_INDEX_PATH = "./.r1_semantic.index"
+_SEMANTIC_STORE_PATH = "./.r1_semantic.json"
+_embedder = None
+_semantic_index = None
+_semantic_store = []
+_semantic_loaded = False
+
+def _semantic_embed(text):
+    """Embed text with all-MiniLM-L6-v2, L2-normalized for cosine via inner product."""
+    global _embedder
+    if _embedder is None:
+        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    vec = _embedder.encode([text], convert_to_numpy=True).astype("float32")
+    faiss.normalize_L2(vec)
+    return vec
+
+def _semantic_load():
+    """Load the persisted index and URL store once per process."""
+    global _semantic_index, _semantic_store, _semantic_loaded
+    if _semantic_loaded:
+        return
+    _semantic_loaded = True
+    if os.path.exists(_SEMANTIC_INDEX_PATH) and os.path.exists(_SEMANTIC_STORE_PATH):
+        _semantic_index = faiss.read_index(_SEMANTIC_INDEX_PATH)
+        with open(_SEMANTIC_STORE_PATH) as f:
+            _semantic_store = json.load(f)
+
+def _semantic_lookup(company, objective):
+    """Return cached URLs for a semantically equivalent query, or None."""
+    if not _semantic_enabled:
+        return None
+    _semantic_load()
+    if _semantic_index is None or _semantic_index.ntotal == 0:
+        return None
+    vec = _semantic_embed(f"{company}|{objective}")
+    scores, ids = _semantic_index.search(vec, 1)
+    if scores[0][0] > _SEMANTIC_THRESHOLD:
+        return _semantic_store[int(ids[0][0])]
+    return None
+
+def _semantic_add(company, objective, urls):
+    """Index this query's embedding and persist so future runs can hit it."""
+    if not _semantic_enabled:
+        return
+    _semantic_load()
+    global _semantic_index
+    vec = _semantic_embed(f"{company}|{objective}")
+    if _semantic_index is None:
+        _semantic_index = faiss.IndexFlatIP(vec.shape[1])
+    _semantic_index.add(vec)
+    _semantic_store.append(urls)
+    faiss.write_index(_semantic_index, _SEMANTIC_INDEX_PATH)
+    with open(_SEMANTIC_STORE_PATH, "w") as f:
+        json.dump(_semantic_store, f)
+
+# Memoized builders for the per-call invariants, so batched/concurrent runs
+# don't rebuild the same headers dict and prompt string on every request
+@lru_cache(maxsize=8)
+def _firecrawl_headers(api_key):
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {api_key}'
+    }
+
+@lru_cache(maxsize=256)
+def _prompt_for(prompt, company):
+    return f"{prompt} for {company}"
+
+# Hosts R1 is told to skip anyway - filter them locally for free
+_SOCIAL_HOSTS = {
+    "twitter.com", "x.com", "facebook.com", "linkedin.com",
+    "instagram.com", "tiktok.com", "youtube.com"
+}
+
+# rapidfuzz scores titles in C; difflib is the slower stdlib stand-in
+try:
+    from rapidfuzz import fuzz
+
+    def _title_score(company, title):
+        return fuzz.partial_ratio(company.lower(), title.lower())
+except ImportError:
+    from difflib import SequenceMatcher
+
+    def _title_score(company, title):
+        return 100 * SequenceMatcher(None, company.lower(), title.lower()).ratio()
+
+def _normalized_host(link):
+    host = urlparse(link).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+def _heuristic_filter(serp_results, company, keep=8):
+    """
+    Trim SERP results before they reach R1: drop social-media and duplicate
+    hosts, then keep the top entries by company/title similarity. A smaller
+    prompt means faster prefill and fewer billed tokens.
+    """
+    seen_hosts = set()
+    filtered = []
+    for r in serp_results:
+        link = r.get("link")
+        if not link:
+            continue
+        host = _normalized_host(link)
+        if host in _SOCIAL_HOSTS or host in seen_hosts:
+            continue
+        seen_hosts.add(host)
+        filtered.append(r)
+
+    filtered.sort(key=lambda r: _title_score(company, r.get("title") or ""), reverse=True)
+    return filtered[:keep]
+
+def _obvious_urls(serp_results, company):
+    """
+    When at most 3 candidates survive filtering and every host's registrable
+    label is the company name, R1 has nothing left to decide - return them
+    directly. The label must match exactly: substring containment would let
+    applebees.com pass for "Apple" and ship unrelated URLs straight to a
+    billed extraction.
+    """
+    if not serp_results or len(serp_results) > 3:
+        return None
+    token = re.sub(r'[^a-z0-9]', '', company.lower())
+    if not token:
+        return None
+    for r in serp_results:
+        label = re.sub(r'[^a-z0-9]', '', _normalized_host(r["link"]).split('.')[0])
+        if label != token:
+            return None
+    return _clean_urls([r["link"] for r in serp_results])
+
+def _trim(s, n=120):
+    """Cut a snippet to n chars at a word boundary; Google pads well past that."""
+    if s is None or len(s) <= n:
+        return s
+    return s[:n].rsplit(' ', 1)[0] + '…'
+
+def _serp_payload(serp_results):
+    """Reduce raw SERP results to trimmed title/link/snippet fields for R1."""
+    payload = []
+    for r in serp_results:
+        link = r.get("link")
+        if not link:
+            continue
+        title = r.get("title")
+        # A title that just repeats the host carries no extra signal
+        if title and title.strip().lower() == _normalized_host(link):
+            title = None
+        payload.append({"title": title, "link": link, "snippet": _trim(r.get("snippet"))})
+    return payload
+
+def _group_urls_by_host(urls):
+    """
+    Collapse URLs into one host/* entry per host when either R1 marked any of
+    the host's URLs with a trailing /* wildcard or the host appears more than
+    once, so Firecrawl crawls the site once instead of ingesting each page as
+    a separate request. Other singleton hosts keep their exact URL.
+    """
+    by_host = {}
+    wildcard_hosts = set()
+    for url in urls:
+        host = urlparse(url).netloc
+        if url.endswith('/*'):
+            wildcard_hosts.add(host)
+        by_host.setdefault(host, []).append(url)
+
+    grouped = []
+    for host, host_urls in by_host.items():
+        if host in wildcard_hosts or len(host_urls) > 1:
+            grouped.append(f"https://{host}/*")
+        else:
+            grouped.append(host_urls[0])
+    return grouped
+
+# Precompiled so cleanup is a single C-level regex pass per URL
+_URL_CLEAN = re.compile(r'/\*|/+$')
+_WILDCARD = re.compile(r'/\*$')
+_HTTP = re.compile(r'^https?://').match
+
+def _clean_urls(urls):
+    """
+    Normalize URLs in one pass, keeping http(s) only. A trailing /* is R1's
+    explicit crawl-the-whole-site signal and is preserved for the grouping
+    step; stray wildcards and trailing slashes elsewhere are stripped.
+    """
+    cleaned = []
+    for url in urls:
+        wildcard = _WILDCARD.search(url) is not None
+        u = _URL_CLEAN.sub('', url)
+        if not _HTTP(u):
+            continue
+        cleaned.append(u + '/*' if wildcard else u)
+    return cleaned
+
+def _first_json_object(buf):
+    """
+    Return the first balanced {...} in buf that contains "selected_urls",
+    or None if no such object is complete yet.
+    """
+    start = buf.find('{')
+    while start != -1:
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(buf)):
+            ch = buf[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    candidate = buf[start:i + 1]
+                    if '"selected_urls"' in candidate:
+                        return candidate
+                    break  # balanced but not our object; try the next brace
+        else:
+            return None  # object still open; need more tokens
+        start = buf.find('{', start + 1)
+    return None
+
+# All instructions, the schema and the example live in this fixed system
+# prompt so the static prefix is identical on every call.
+_R1_SYSTEM_PROMPT = (
+    "You are a URL selector that always responds with valid JSON. You select URLs from the SERP "
+    "results relevant to the company and objective. Your response must be a JSON object with a "
+    "'selected_urls' array property containing strings.\n\n"
+    "Return a JSON object with a property 'selected_urls' that contains an array "
+    "of URLs most likely to help meet the objective. Add a /* to the end of the URL if you think "
+    "it should search all of the pages in the site. Do not return any social media links. "
+    "For example: {\"selected_urls\": [\"https://example.com\", \"https://example2.com\"]}"
+)
+
+# Batch variant: one call covers several companies, paying the fixed
+# instruction prefix once. Kept byte-identical across calls like the above.
+_R1_BATCH_SYSTEM_PROMPT = (
+    "You are a URL selector that always responds with valid JSON. You receive a JSON array of "
+    "jobs, each with 'company', 'objective' and 'serp_data'. For every job, select the SERP URLs "
+    "most likely to help meet that job's objective. Add a /* to the end of a URL if you think it "
+    "should search all of the pages in the site. Do not return any social media links.\n\n"
+    "Your response must be a JSON object of the form "
+    "{\"results\": [{\"company\": \"...\", \"selected_urls\": [\"https://example.com\"]}]} "
+    "with exactly one entry per job, in the same order as the input."
+)
+
+# Cap the number of companies per call to keep the prompt well inside the
+# model's context window.
+_R1_BATCH_SIZE = 10
+
+def search_google(query, force_refresh=False):
+    """Search Google using SerpAPI and return top results, cached per (query, day)."""
+    key = hashlib.sha256(f"{query}|{date.today().isoformat()}".encode()).hexdigest()
+    if not force_refresh:
+        cached = _serp_cache.get(key)
+        if cached is not None:
+            logger.info("SERP cache hit for '%s'.", query)
+            return cached
+
+    logger.info("Searching Google for '%s'...", query)
     search = GoogleSearch({"q": query, "api_key": serp_api_key})
-    return search.get_dict().get("organic_results", [])
+    results = search.get_dict().get("organic_results", [])
+    if results:
+        _cache_set(_serp_cache, key, results, ttl=86400)
+    return results
 
-def select_urls_with_r1(company, objective, serp_results):
+async def select_urls_with_r1(company, objective, serp_results):
     """
     Use R1 to select the most relevant URLs from SERP results for the given company and objective.
     Returns a list of URLs.
     """
     try:
+        # A semantically equivalent past query skips the R1 call entirely
+        cached_urls = _semantic_lookup(company, objective)
+        if cached_urls is not None:
+            logger.info("Semantic cache hit - reusing earlier URL selection:")
+            for url in cached_urls:
+                logger.info("- %s", url)
+            return cached_urls
+
+        # Cheap local pre-filter first; sometimes it settles the question
+        # without spending an R1 call at all
+        serp_results = _heuristic_filter(serp_results, company)
+
+        obvious = _obvious_urls(serp_results, company)
+        if obvious:
+            logger.info("All remaining candidates match %s directly - skipping R1:", company)
+            for url in obvious:
+                logger.info("- %s", url)
+            _semantic_add(company, objective, obvious)
+            return obvious
+
         # Prepare the data for R1
-        serp_data = [{"title": r.get("title"), "link": r.get("link"), "snippet": r.get("snippet")} 
-                     for r in serp_results if r.get("link")]
+        serp_data = _serp_payload(serp_results)
 
-        response = client.chat.completions.create(
-            model="deepseek-reasoner",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a URL selector that always responds with valid JSON. You select URLs from the SERP results relevant to the company and objective. Your response must be a JSON object with a 'selected_urls' array property containing strings."
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Company: {company}\n"
-                        f"Objective: {objective}\n"
-                        f"SERP Results: {json.dumps(serp_data)}\n\n"
-                        "Return a JSON object with a property 'selected_urls' that contains an array "
-                        "of URLs most likely to help meet the objective. Add a /* to the end of the URL if you think it should search all of the pages in the site. Do not return any social media links. For example: {\"selected_urls\": [\"https://example.com\", \"https://example2.com\"]}"
-                    )
-                }
-            ]
-        )
+        # Keep the system message byte-identical across calls (no interpolation)
+        # so provider-side prompt caching can hit on the static prefix; only
+        # the user message carries the dynamic tail.
+        messages = [
+            {
+                "role": "system",
+                "content": _R1_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Company: {company}\n"
+                    f"Objective: {objective}\n"
+                    f"SERP Results: {_json_dumps(serp_data, sort_keys=True)}"
+                )
+            }
+        ]
 
+        # Short-circuit the API call when we've seen this exact payload before
+        cache_key = _r1_cache_key({"model": "deepseek-reasoner", "messages": messages})
+        content = _r1_cache.get(cache_key)
+        from_cache = content is not None
+        if from_cache:
+            _r1_cache_stats["hits"] += 1
+        else:
+            _r1_cache_stats["misses"] += 1
+            # Stream tokens and stop as soon as the selected_urls object
+            # closes - no need to wait for R1's trailing output.
+            stream = await client.chat.completions.create(
+                model="deepseek-reasoner",
+                messages=messages,
+                temperature=0,
+                max_tokens=512,
+                response_format={"type": "json_object"},
+                stream=True
+            )
+            buf = ""
+            content = None
+            async for chunk in stream:
+                delta = chunk.choices[0].delta if chunk.choices else None
+                piece = getattr(delta, "content", None) if delta else None
+                if not piece:
+                    continue
+                buf += piece
+                obj = _first_json_object(buf)
+                if obj is not None:
+                    content = obj
+                    break
+            await stream.close()
+            if content is None:
+                content = buf
+
+        # json_object mode guarantees valid JSON, so anything else is an error
         try:
-            # First try to parse as JSON
-            result = json.loads(response.choices[0].message.content)
-            if isinstance(result, dict) and "selected_urls" in result:
-                urls = result["selected_urls"]
-            else:
-                # If JSON doesn't have the expected structure, fall back to text parsing
-                response_text = response.choices[0].message.content
-                urls = [line.strip() for line in response_text.split('\n') 
-                       if line.strip().startswith(('http://', 'https://'))]
-        except json.JSONDecodeError:
-            # If JSON parsing fails, fall back to text parsing
-            response_text = response.choices[0].message.content
-            urls = [line.strip() for line in response_text.split('\n') 
-                   if line.strip().startswith(('http://', 'https://'))]
+            result = _json_loads(content)
+        except _JSONDecodeError as e:
+            logger.error("R1 returned invalid JSON: %s", e)
+            return []
+
+        if not isinstance(result, dict) or not isinstance(result.get("selected_urls"), list):
+            logger.error("R1 response missing the 'selected_urls' array.")
+            return []
+
+        # Cache only after validation - a stream truncated at max_tokens must
+        # not become a sticky failure for every identical query in the TTL
+        if not from_cache:
+            _r1_cache_set(cache_key, content)
+
+        urls = [u for u in result["selected_urls"] if isinstance(u, str)]
 
         # Clean up URLs - remove wildcards and trailing slashes
-        cleaned_urls = [url.replace('/*', '').rstrip('/') for url in urls]
-        cleaned_urls = [url for url in cleaned_urls if url]
+        cleaned_urls = _clean_urls(urls)
 
         if not cleaned_urls:
-            print(f"{Colors.YELLOW}No valid URLs found.{Colors.RESET}")
+            logger.warning("No valid URLs found.")
             return []
 
-        print(f"{Colors.CYAN}Selected URLs for extraction by R1:{Colors.RESET}")
+        logger.info("Selected URLs for extraction by R1:")
         for url in cleaned_urls:
-            print(f"- {url}")
+            logger.info("- %s", url)
+
+        _semantic_add(company, objective, cleaned_urls)
 
         return cleaned_urls
 
     except Exception as e:
-        print(f"{Colors.RED}Error selecting URLs with R1: {e}{Colors.RESET}")
+        logger.error("Error selecting URLs with R1: %s", e)
         return []
 
-def extract_company_info(urls, prompt, company, api_key):
-    """Use requests to call Firecrawl's extract endpoint with selected URLs."""
-    print(f"{Colors.YELLOW}Extracting structured data from the provided URLs using Firecrawl...{Colors.RESET}")
-    
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {api_key}'
-    }
-    
+async def select_urls_with_r1_batch(jobs):
+    """
+    Select URLs for several companies in one R1 call, amortizing the fixed
+    instruction prefix across the batch. jobs is a list of
+    (company, objective, serp_results) tuples; returns {company: [urls]}.
+    """
+    selections = {}
+
+    for offset in range(0, len(jobs), _R1_BATCH_SIZE):
+        chunk = jobs[offset:offset + _R1_BATCH_SIZE]
+        entries = [
+            {"company": company, "objective": objective,
+             "serp_data": _serp_payload(_heuristic_filter(serp_results, company))}
+            for company, objective, serp_results in chunk
+        ]
+
+        messages = [
+            {
+                "role": "system",
+                "content": _R1_BATCH_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"Jobs: {_json_dumps(entries, sort_keys=True)}"
+            }
+        ]
+
+        try:
+            cache_key = _r1_cache_key({"model": "deepseek-reasoner", "messages": messages})
+            content = _r1_cache.get(cache_key)
+            from_cache = content is not None
+            if from_cache:
+                _r1_cache_stats["hits"] += 1
+            else:
+                _r1_cache_stats["misses"] += 1
+                response = await client.chat.completions.create(
+                    model="deepseek-reasoner",
+                    messages=messages,
+                    temperature=0,
+                    response_format={"type": "json_object"}
+                )
+                content = response.choices[0].message.content
+
+            result = _json_loads(content)
+        except Exception as e:
+            logger.error("Error selecting URLs with R1 for batch: %s", e)
+            continue
+
+        # Keep only well-formed entries: a company string plus a list of URL strings
+        if not isinstance(result, dict) or not isinstance(result.get("results"), list):
+            logger.error("Unexpected batch response structure from R1.")
+            continue
+
+        # Cache only responses that parsed and had the expected shape, so an
+        # unparseable batch doesn't poison every retry within the TTL
+        if not from_cache:
+            _r1_cache_set(cache_key, content)
+
+        for entry in result["results"]:
+            if (isinstance(entry, dict)
+                    and isinstance(entry.get("company"), str)
+                    and isinstance(entry.get("selected_urls"), list)):
+                urls = [u for u in entry["selected_urls"] if isinstance(u, str)]
+                selections[entry["company"]] = _clean_urls(urls)
+
+    return selections
+
+async def extract_company_info(urls, prompt, company, api_key):
+    """Use httpx to call Firecrawl's extract endpoint with selected URLs."""
+    urls = _group_urls_by_host(urls)
+
+    cache_key = _firecrawl_cache_key(urls, prompt, company)
+    cached = _firecrawl_cache.get(cache_key)
+    if cached is not None:
+        _firecrawl_cache_stats["hits"] += 1
+        logger.info("Firecrawl cache hit for %s - reusing stored extraction.", company)
+        return cached
+    _firecrawl_cache_stats["misses"] += 1
+
+    logger.info("Extracting structured data from the provided URLs using Firecrawl...")
+
+    headers = _firecrawl_headers(api_key)
+
     payload = {
         "urls": urls,
-        "prompt": prompt + " for " + company,
+        "prompt": _prompt_for(prompt, company),
         "enableWebSearch": True
     }
-    
+
     try:
-        response = requests.post(
+        http_client = _get_http_client()
+        response = await http_client.post(
             "https://api.firecrawl.dev/v1/extract",
             headers=headers,
-            json=payload,
-            timeout=30
+            json=payload
         )
-        
+
         data = response.json()
-        
+
         if not data.get('success'):
-            print(f"{Colors.RED}API returned error: {data.get('error', 'No error message')}{Colors.RESET}")
+            logger.error("API returned error: %s", data.get('error', 'No error message'))
             return None
-        
+
         # Assuming Firecrawl provides a way to retrieve data with 'id'
         extraction_id = data.get('id')
         if not extraction_id:
-            print(f"{Colors.RED}No extraction ID found in response.{Colors.RESET}")
+            logger.error("No extraction ID found in response.")
             return None
 
         # Polling for the extraction result
-        return poll_firecrawl_result(extraction_id, api_key)
+        result = await poll_firecrawl_result(http_client, extraction_id, api_key)
+        if result is not None:
+            _cache_set(_firecrawl_cache, cache_key, result, ttl=86400)
+        return result
 
-    except requests.exceptions.RequestException as e:
-        print(f"{Colors.RED}Request failed: {e}{Colors.RESET}")
+    except httpx.RequestError as e:
+        logger.error("Request failed: %s", e)
         return None
     except json.JSONDecodeError as e:
-        print(f"{Colors.RED}Failed to parse response: {e}{Colors.RESET}")
+        logger.error("Failed to parse response: %s", e)
         return None
     except Exception as e:
-        print(f"{Colors.RED}Failed to extract data: {e}{Colors.RESET}")
+        logger.error("Failed to extract data: %s", e)
         return None
 
-def poll_firecrawl_result(extraction_id, api_key, interval=5, max_attempts=36):
-    """Poll Firecrawl API to get the extraction result."""
+async def poll_firecrawl_result(http_client, extraction_id, api_key,
+                                initial=None, max_interval=None, max_wall_seconds=None):
+    """Poll Firecrawl API with capped exponential backoff until the result is ready."""
     url = f"https://api.firecrawl.dev/v1/extract/{extraction_id}"
-    headers = {
-        'Authorization': f'Bearer {api_key}'
-    }
+    # An extraction id containing path tricks (../, scheme, @host) must not
+    # redirect the poll off the Firecrawl API
+    if urlparse(url).netloc != _FIRECRAWL_HOST:
+        logger.error("Refusing to poll non-Firecrawl URL: %s", url)
+        return None
+    headers = _firecrawl_headers(api_key)
 
-    for attempt in range(1, max_attempts + 1):
+    # Kwargs win over env vars, env vars over defaults
+    if initial is None:
+        initial = float(os.getenv("FIRECRAWL_POLL_INITIAL", "1.0"))
+    if max_interval is None:
+        max_interval = float(os.getenv("FIRECRAWL_POLL_MAX", "15.0"))
+    if max_wall_seconds is None:
+        max_wall_seconds = float(os.getenv("FIRECRAWL_POLL_WALL", "120"))
+
+    start = time.monotonic()
+    attempt = 0
+    while time.monotonic() - start < max_wall_seconds:
         try:
-            # print(f"{Colors.YELLOW}Polling for extraction result (Attempt {attempt}/{max_attempts})...{Colors.RESET}")
-            response = requests.get(url, headers=headers, timeout=30)
+            response = await http_client.get(url, headers=headers)
             response.raise_for_status()
             data = response.json()
 
             if data.get('success') and data.get('data'):
-                print(f"{Colors.GREEN}Data successfully extracted:{Colors.RESET}")
-                print(json.dumps(data['data'], indent=2))
+                logger.info("Data successfully extracted:")
+                logger.info("%s", _json_dumps(data['data'], indent=True))
                 return data['data']
             elif data.get('success') and not data.get('data'):
-                time.sleep(interval)
+                # Capped exponential backoff with jitter so concurrent
+                # extractions don't poll in lockstep; yields to the event loop
+                interval = min(initial * (1.6 ** attempt), max_interval)
+                interval *= random.uniform(0.8, 1.2)
+                attempt += 1
+                await asyncio.sleep(interval)
             else:
-                print(f"{Colors.RED}API Error: {data.get('error', 'No error message provided')}{Colors.RESET}")
+                logger.error("API Error: %s", data.get('error', 'No error message provided'))
                 return None
 
-        except requests.exceptions.RequestException:
+        except httpx.HTTPError:
             return None
         except json.JSONDecodeError:
             return None
         except Exception:
             return None
 
-    print(f"{Colors.RED}Max polling attempts reached. Extraction did not complete in time.{Colors.RESET}")
+    logger.error("Polling timed out after %.0fs. Extraction did not complete in time.", max_wall_seconds)
     return None
 
-def main():
-    company = input(f"{Colors.BLUE}Enter the company name: {Colors.RESET}")
-    objective = input(f"{Colors.BLUE}Enter what information you want about the company: {Colors.RESET}")
-    
-    serp_results = search_google(f"{company}")
+async def _warm_r1_cache():
+    """
+    Send a 1-token completion carrying only the static system prompt so the
+    provider's KV cache holds the prefix before the real request arrives.
+    """
+    try:
+        await client.chat.completions.create(
+            model="deepseek-reasoner",
+            messages=[{"role": "system", "content": _R1_SYSTEM_PROMPT}],
+            max_tokens=1
+        )
+    except Exception:
+        pass  # warming is best-effort; the real call proceeds regardless
+
+async def run_one(company, objective):
+    """Run the full SERP -> R1 -> Firecrawl pipeline for a single company."""
+    # The SERP fetch and the prompt-cache warm-up are independent network
+    # round-trips - start both and overlap them
+    serp_task = asyncio.create_task(asyncio.to_thread(search_google, f"{company}"))
+    warm_task = asyncio.create_task(_warm_r1_cache())
+    serp_results, _ = await asyncio.gather(serp_task, warm_task)
     if not serp_results:
-        print(f"{Colors.RED}No search results found.{Colors.RESET}")
-        return
-    
-    # Ask R1 to select URLs
-    selected_urls = select_urls_with_r1(company, objective, serp_results)
-    
+        logger.error("No search results found for %s.", company)
+        return None
+
+    selected_urls = await select_urls_with_r1(company, objective, serp_results)
     if not selected_urls:
-        print(f"{Colors.RED}R1 did not return any URLs.{Colors.RESET}")
-        return
-    
-    data = extract_company_info(selected_urls, objective, company, firecrawl_api_key)
-    
+        logger.error("R1 did not return any URLs for %s.", company)
+        return None
+
+    return await extract_company_info(selected_urls, objective, company, firecrawl_api_key)
+
+async def gather_companies(companies, objective):
+    """Research multiple companies concurrently and return their results in order."""
+    return await asyncio.gather(*[run_one(company, objective) for company in companies])
+
+async def gather_companies_batched(jobs):
+    """
+    Research multiple (company, objective, serp_results) jobs using a single
+    batched R1 call, then extract all companies concurrently.
+    """
+    selections = await select_urls_with_r1_batch(jobs)
+
+    async def extract(company, objective):
+        urls = selections.get(company)
+        if not urls:
+            logger.error("R1 did not return any URLs for %s.", company)
+            return None
+        return await extract_company_info(urls, objective, company, firecrawl_api_key)
+
+    return await asyncio.gather(*[extract(company, objective) for company, objective, _ in jobs])
+
+async def main():
+    company = input(f"{BLUE}Enter the company name: {RESET}")
+    objective = input(f"{BLUE}Enter what information you want about the company: {RESET}")
+
+    data = await run_one(company, objective)
+
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+
+    logger.info("R1 cache: %d hits, %d misses", _r1_cache_stats['hits'], _r1_cache_stats['misses'])
+    logger.info("Firecrawl cache: %d hits, %d misses",
+                _firecrawl_cache_stats['hits'], _firecrawl_cache_stats['misses'])
+
     if data:
-        print(f"{Colors.GREEN}Extraction completed successfully.{Colors.RESET}")
+        logger.info("Extraction completed successfully.")
     else:
-        print(f"{Colors.RED}Failed to extract the requested information. Try refining your prompt or choosing a different company.{Colors.RESET}")
+        logger.error("Failed to extract the requested information. Try refining your prompt or choosing a different company.")
 
 if __name__ == "__main__":
-        main()
\ No newline at end of file
+    asyncio.run(main())